@@ -2,13 +2,15 @@ import sys
 import os
 import json
 import time
-import platform
 import re
-import asyncio
-import aiohttp
+import codecs
+import base64
+import ctypes
+import functools
 import requests
-import psutil
-from typing import List, Dict
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import List, Dict, Tuple
 from cryptography.fernet import Fernet
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QVBoxLayout, QHBoxLayout, QTextEdit, QPushButton, QLabel,
@@ -16,44 +18,147 @@ from PyQt5.QtWidgets import (
     QMessageBox, QToolBar, QAction, QStatusBar, QFileDialog, QMenu, QToolButton,
     QLineEdit, QDialog, QDialogButtonBox, QFormLayout, QGroupBox, QShortcut, QPlainTextEdit
 )
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QSettings, QTimer, QObject, QSize,QPropertyAnimation
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QSettings, QTimer, QObject, QSize, pyqtSlot, QRunnable, QThreadPool, QSaveFile, QIODevice, QUrl, QRegularExpression, QVariantAnimation
+from PyQt5.QtNetwork import QNetworkAccessManager, QNetworkRequest, QNetworkReply
 from PyQt5.QtGui import QTextCursor, QPalette, QColor, QFont, QIcon, QTextCharFormat, QKeySequence, QTextDocument,QLinearGradient,QBrush
 
-# Scintilla lexer import
+# Gyors JSON (opcionális)
 try:
-    from PyQt5.Qsci import (QsciScintilla, QsciLexerPython, QsciLexerCPP, QsciLexerJava, QsciLexerJavaScript,
-                           QsciLexerHTML, QsciLexerXML, QsciLexerJSON, QsciLexerBash, QsciLexerSQL)
-    HAS_SCINTILLA = True
+    import orjson
+    HAS_ORJSON = True
 except ImportError:
-    HAS_SCINTILLA = False
+    HAS_ORJSON = False
 
 # Alapbeállítások
 APP_NAME = "SzitaAIPro"
 API_URL = "https://openrouter.ai/api/v1/chat/completions"
 MODEL_URL = "https://openrouter.ai/api/v1/models"
+MODEL_CACHE_TTL = 300
 MAX_HISTORY = 15
+AUTOSAVE_DELAY_MS = 2000
+# Átmeneti HTTP hibák, amelyeknél a kérést automatikusan újrapróbáljuk
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# (kapcsolódás, olvasás) időkorlát: a leállítás kapcsolódás közben legfeljebb ennyit vár
+REQUEST_TIMEOUT = (10, 60)
 MAX_FILE_SIZE = 30000
 TOKEN_OPTIONS = [4096, 8192, 16384, 32768, 65536, 131072]
+TOKEN_INDEX = {t: i for i, t in enumerate(TOKEN_OPTIONS)}
+IO_BUFFER_SIZE = 1 << 20
+READ_CHUNK_SIZE = 64 * 1024
+CODE_BLOCK_RE = re.compile(r"^```([a-zA-Z]{3,})\n(.*?)\n```$", re.MULTILINE | re.DOTALL)
+PROVIDER_RE = re.compile(r"deepseek|openrouter|google|bigcode|mistral|meta|"
+                         r"moonshotai|anthropic|openai|nous|perplexity|qwen")
 DEFAULT_TEMP = 0.4
 DEFAULT_TOKENS_INDEX = 3
 
-def optimize_system():
-    """Rendszerrősszék optimalizálása"""
-    try:
-        proc = psutil.Process(os.getpid())
-        if platform.system() == "Windows":
-            proc.nice(psutil.HIGH_PRIORITY_CLASS)
-        else:
-            proc.nice(-18)
-
-        num_threads = str(os.cpu_count() or 4)
-        os.environ["OMP_NUM_THREADS"] = num_threads
-        os.environ["OPENBLAS_NUM_THREADS"] = num_threads
-        os.environ["MKL_NUM_THREADS"] = num_threads
-    except Exception:
-        pass
-
-optimize_system()
+# Sötét téma
+DARK_PALETTE_SPEC = (
+    (QPalette.Window, "#2c3e50"),
+    (QPalette.WindowText, "#ecf0f1"),
+    (QPalette.Base, "#34495e"),
+    (QPalette.AlternateBase, "#2c3e50"),
+    (QPalette.ToolTipBase, "#34495e"),
+    (QPalette.ToolTipText, "#ecf0f1"),
+    (QPalette.Text, "#ecf0f1"),
+    (QPalette.Button, "#3498db"),
+    (QPalette.ButtonText, "#ffffff"),
+    (QPalette.Highlight, "#3498db"),
+    (QPalette.HighlightedText, "#ffffff"),
+)
+CHAT_BG_QSS = "background-color: {};"
+DARK_QSS = """
+    QWidget { background-color:#2c3e50; color:#ecf0f1; font-family:"Segoe UI"; font-size:14px; }
+    QTextEdit, QPlainTextEdit { background:#34495e; color:#ecf0f1; border:1px solid #2c3e50; border-radius:8px; padding:12px; }
+    QComboBox, QDoubleSpinBox, QSpinBox, QLineEdit { background:#34495e; color:#ecf0f1; border:1px solid #2c3e50; border-radius:8px; padding:8px; }
+    QPushButton { background:#3498db; color:white; padding:10px 20px; border-radius:8px; border:none; font-weight:bold; }
+    QPushButton:hover { background:#2980b9; }
+    QPushButton:pressed { background:#2471a3; }
+    QPushButton:disabled { background:#7f8c8d; color:#bdc3c7; }
+    QStatusBar { color:#95a5a6; font-size:12px; background:#232f34; border-top:1px solid #2c3e50; }
+    QTabWidget::pane { border:1px solid #2c3e50; background:#232f34; border-radius:8px; }
+    QTabBar::tab { background:#34495e; color:#ecf0f1; padding:8px 16px; border-top-left-radius:8px; border-top-right-radius:8px; }
+    QTabBar::tab:selected { background:#2c3e50; }
+    QGroupBox { border:1px solid #2c3e50; border-radius:8px; margin-top:1em; padding:10px; }
+    QGroupBox::title { left:10px; padding:0 3px; color:#ecf0f1; }
+    QToolBar { background:#232f34; padding:5px; }
+    QToolButton { background:transparent; border:none; padding:5px; color:#ecf0f1; }
+    QToolButton:hover { background:#34495e; border-radius:4px; }
+    QMenu { background:#34495e; color:#ecf0f1; border:1px solid #2c3e50; border-radius:4px; }
+    QMenu::item { padding:8px 20px; }
+    QMenu::item:selected { background:#3498db; }
+    QScrollBar:vertical { background:#232f34; width:10px; }
+    QScrollBar::handle:vertical { background:#3498db; min-height:20px; border-radius:5px; }
+    QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical { height:0px; }
+    QWidget#codeEditor { background-color:#ced6cb; }
+"""
+
+@functools.lru_cache(maxsize=1)
+def dark_palette() -> QPalette:
+    """Sötét paletta (egyszer épül fel)"""
+    palette = QPalette()
+    for role, color in DARK_PALETTE_SPEC:
+        palette.setColor(role, QColor(color))
+    return palette
+
+def json_dumps(obj, indent: bool = False) -> bytes:
+    """JSON szerializálás UTF-8 bájtokba (orjson, ha elérhető)"""
+    if HAS_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    return json.dumps(obj, ensure_ascii=False, indent=2 if indent else None).encode('utf-8')
+
+def json_loads(data):
+    """JSON beolvasása bájtokból vagy szövegből"""
+    return orjson.loads(data) if HAS_ORJSON else json.loads(data)
+
+def read_text_file(path: str, limit: int):
+    """UTF-8 szövegfájl beolvasása; None, ha hosszabb limit karakternél"""
+    # UTF-8-ban egy karakter legfeljebb 4 bájt: ennél nagyobb fájlt meg sem nyitunk
+    size = os.path.getsize(path)
+    if size > limit * 4:
+        return None
+    # limit bájtnál kisebb fájl biztosan belefér: egyetlen olvasás és dekódolás
+    if size <= limit:
+        with open(path, 'rb') as f:
+            return f.read().decode('utf-8').replace('\r\n', '\n')
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    parts = []
+    length = 0
+    prev_cr = False
+    with open(path, 'rb', buffering=IO_BUFFER_SIZE) as f:
+        for chunk in iter(lambda: f.read(READ_CHUNK_SIZE), b''):
+            part = decoder.decode(chunk)
+            if not part:
+                continue
+            # Hossz a CRLF -> LF csere utáni értelemben; a \r\n darabhatárra is eshet
+            length += len(part) - part.count('\r\n') - (prev_cr and part[0] == '\n')
+            prev_cr = part[-1] == '\r'
+            if length > limit:
+                return None
+            parts.append(part)
+    parts.append(decoder.decode(b'', final=True))
+    txt = ''.join(parts).replace('\r\n', '\n')
+    return txt if len(txt) <= limit else None
+
+def write_json_file(path: str, obj):
+    """Objektum mentése JSON fájlba (atomikus csere QSaveFile-lal)"""
+    f = QSaveFile(path)
+    if not f.open(QIODevice.WriteOnly):
+        raise OSError(f.errorString())
+    f.write(json_dumps(obj, indent=True))
+    if not f.commit():
+        raise OSError(f.errorString())
+
+def append_jsonl_file(path: str, items):
+    """Elemek hozzáfűzése JSONL fájlhoz egyetlen írással"""
+    with open(path, 'ab') as f:
+        f.write(b"".join(json_dumps(m) + b"\n" for m in items))
+
+def remove_files(directory: str):
+    """Könyvtár összes fájljának törlése"""
+    with os.scandir(directory) as it:
+        for entry in it:
+            if entry.is_file(follow_symlinks=False):
+                os.unlink(entry.path)
 
 class SettingsManager:
     """Beállítások kezelése"""
@@ -61,137 +166,271 @@ class SettingsManager:
         self.config_dir = os.path.join(os.getenv('APPDATA', os.path.expanduser("~")), APP_NAME)
         os.makedirs(self.config_dir, exist_ok=True)
         self.settings = QSettings(os.path.join(self.config_dir, 'config.ini'), QSettings.IniFormat)
+        self._cache = {}
+        self._history_dir = None
 
     def get(self, key: str, default=None):
-        return self.settings.value(key, default)
+        if key in self._cache:
+            return self._cache[key]
+        if not self.settings.contains(key):
+            return default
+        value = self._cache[key] = self.settings.value(key, default)
+        return value
 
     def set(self, key, value):
+        if key in self._cache and self._cache[key] == value:
+            return
+        self._cache[key] = value
         self.settings.setValue(key, value)
 
+    def remove(self, key):
+        self._cache.pop(key, None)
+        self.settings.remove(key)
+
+    def sync(self):
+        self.settings.sync()
+
     @property
     def history_dir(self):
-        path = os.path.join(self.config_dir, 'history')
-        os.makedirs(path, exist_ok=True)
-        return path
+        if self._history_dir is None:
+            path = os.path.join(self.config_dir, 'history')
+            os.makedirs(path, exist_ok=True)
+            self._history_dir = path
+        return self._history_dir
 
 settings = SettingsManager()
 
+# Windows DPAPI: a titkosítókulcs a felhasználói profilhoz kötve kerül a konfigurációba
+HAS_DPAPI = sys.platform == 'win32'
+CRYPTPROTECT_UI_FORBIDDEN = 0x01
+
+class DATA_BLOB(ctypes.Structure):
+    _fields_ = [("cbData", ctypes.c_ulong), ("pbData", ctypes.POINTER(ctypes.c_char))]
+
+def _dpapi_call(func, data: bytes) -> bytes:
+    buf = ctypes.create_string_buffer(data, len(data))
+    blob_in = DATA_BLOB(len(data), ctypes.cast(buf, ctypes.POINTER(ctypes.c_char)))
+    blob_out = DATA_BLOB()
+    if not func(ctypes.byref(blob_in), None, None, None, None,
+                CRYPTPROTECT_UI_FORBIDDEN, ctypes.byref(blob_out)):
+        raise ctypes.WinError()
+    try:
+        return ctypes.string_at(blob_out.pbData, blob_out.cbData)
+    finally:
+        ctypes.windll.kernel32.LocalFree(blob_out.pbData)
+
+def dpapi_protect(data: bytes) -> bytes:
+    """Adat titkosítása az aktuális Windows-felhasználóhoz kötve"""
+    return _dpapi_call(ctypes.windll.crypt32.CryptProtectData, data)
+
+def dpapi_unprotect(data: bytes) -> bytes:
+    """DPAPI-val titkosított adat visszafejtése"""
+    return _dpapi_call(ctypes.windll.crypt32.CryptUnprotectData, data)
+
 class EncryptionManager:
     """Titkosítás kezelése"""
     def __init__(self):
+        # A meglévő védett kulcs nem volt visszafejthető (biztonsági mentésbe került)
+        self.key_lost = False
+        self.cipher = Fernet(self._load_key().encode())
+        # Titkosított szöveg -> visszafejtett érték, hogy egy kulcsot csak egyszer fejtsünk vissza
+        self._decrypted = {}
+
+    def _load_key(self) -> str:
+        """Titkosítókulcs betöltése (Windowson DPAPI-val védve tárolva)"""
+        if HAS_DPAPI:
+            protected = settings.get('encryption_key_dpapi')
+            if protected:
+                try:
+                    return dpapi_unprotect(base64.b64decode(protected)).decode()
+                except (OSError, ValueError):
+                    # A régi kulcs ne vesszen el: más felhasználóval/géppel még visszafejthető lehet
+                    if not settings.get('encryption_key_dpapi_backup'):
+                        settings.set('encryption_key_dpapi_backup', protected)
+                    self.key_lost = True
         key = settings.get('encryption_key')
         if not key:
             key = Fernet.generate_key().decode()
-            settings.set('encryption_key', key)
-        self.cipher = Fernet(key.encode())
+        if HAS_DPAPI:
+            try:
+                settings.set('encryption_key_dpapi',
+                             base64.b64encode(dpapi_protect(key.encode())).decode())
+                # A nyílt kulcs ne maradjon a konfigurációban
+                settings.remove('encryption_key')
+                return key
+            except OSError:
+                pass
+        settings.set('encryption_key', key)
+        return key
 
     def encrypt(self, data: str) -> str:
-        return self.cipher.encrypt(data.encode()).decode()
+        token = self.cipher.encrypt(data.encode()).decode()
+        self._decrypted[token] = data
+        return token
 
     def decrypt(self, data: str) -> str:
         try:
-            return self.cipher.decrypt(data.encode()).decode()
+            return self._decrypted[data]
+        except KeyError:
+            pass
+        try:
+            value = self.cipher.decrypt(data.encode()).decode()
         except Exception:
             return ""
+        self._decrypted[data] = value
+        return value
 
 encryptor = EncryptionManager()
 
-class NetworkManager(QThread):
-    """Hálózati kezelés"""
+class NetworkManager(QObject):
+    """Hálózati kezelés (a Qt eseményhurkán, külön szál nélkül)"""
     models_loaded = pyqtSignal(list)
     error_occurred = pyqtSignal(str)
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, parent=None):
+        super().__init__(parent)
         self.free_only = True
-        self.session = None
+        self._nam = QNetworkAccessManager(self)
+        self._reply = None
+        # Nyers modellista: szűrőváltáskor ebből dolgozunk, új letöltés nélkül
+        self._cached_models = None
+        self._cached_at = 0.0
+
+    def fetch_models(self):
+        """Modellista lekérése; az eredmény a models_loaded jelzésben érkezik"""
+        # Folyamatban lévő lekérésnél nem indítunk újat: a válasz az aktuális szűrővel dolgozódik fel
+        if self._reply is not None:
+            return
+        if self._cached_models is not None and \
+                time.monotonic() - self._cached_at < MODEL_CACHE_TTL:
+            self.models_loaded.emit(self.parse_models(self._cached_models))
+            return
+        request = QNetworkRequest(QUrl(MODEL_URL))
+        request.setTransferTimeout(10000)
+        self._reply = self._nam.get(request)
+        self._reply.finished.connect(self._on_models_reply)
 
-    async def fetch_models(self):
+    def _on_models_reply(self):
+        reply, self._reply = self._reply, None
         try:
-            async with aiohttp.ClientSession() as session:
-                self.session = session
-                async with session.get(MODEL_URL, timeout=10) as resp:
-                    resp.raise_for_status()
-                    data = await resp.json()
-                    parsed = self.parse_models(data.get('data', []))
-                    self.models_loaded.emit(parsed)
-        except aiohttp.ClientError as e:
-            self.error_occurred.emit(f"Network error: {e}")
+            if reply.error() != QNetworkReply.NoError:
+                self.error_occurred.emit(f"Network error: {reply.errorString()}")
+                return
+            data = json_loads(bytes(reply.readAll()))
+            self._cached_models = data.get('data', [])
+            self._cached_at = time.monotonic()
+            self.models_loaded.emit(self.parse_models(self._cached_models))
         except Exception as e:
             self.error_occurred.emit(f"Unexpected error: {e}")
         finally:
-            if self.session:
-                await self.session.close()
-                self.session = None
+            reply.deleteLater()
 
-    def run(self):
-        asyncio.run(self.fetch_models())
+    def close(self):
+        """Folyamatban lévő lekérés megszakítása (kilépéskor)"""
+        if self._reply is not None:
+            self._reply.finished.disconnect(self._on_models_reply)
+            self._reply.abort()
+            self._reply = None
 
-    def parse_models(self, models: List[Dict]) -> List[str]:
+    def parse_models(self, models: List[Dict]) -> List[Tuple[str, str]]:
         result = []
-        providers = {'deepseek', 'openrouter', 'google', 'bigcode', 'mistral', 'meta',
-                     'moonshotai', 'anthropic', 'openai', 'nous', 'perplexity', 'qwen'}
+        free_only = self.free_only
+        provider_match = PROVIDER_RE.search
 
         for m in models:
             model_id = m.get('id', '')
-            context = m.get('context_length')
-
-            # prompt/completion lehet közvetlenül vagy limits alatt
-            limits = m.get('limits', {})
-            prompt = m.get('prompt', limits.get('prompt'))
-            completion = m.get('completion', limits.get('completion'))
-
             is_free = ":free" in model_id
 
             # csak free modellek, ha kell
-            if self.free_only and not is_free:
+            if free_only and not is_free:
                 continue
 
             # provider szűrés
-            if not any(p in model_id for p in providers):
+            if not provider_match(model_id):
                 continue
 
             # ha van normális context_length, vagy prompt=0 és completion=0
+            context = m.get('context_length')
             if isinstance(context, int):
                 tokens = context // 1024
-            elif prompt == 0 and completion == 0:
-                tokens = 0
             else:
-                continue
+                # prompt/completion lehet közvetlenül vagy limits alatt
+                limits = m.get('limits') or {}
+                if m.get('prompt', limits.get('prompt')) != 0 or \
+                        m.get('completion', limits.get('completion')) != 0:
+                    continue
+                tokens = 0
 
-            label = f"{model_id} | {tokens}K {'🆓' if is_free else '💲'}"
-            result.append(label)
+            result.append((f"{model_id} | {tokens}K " + ('🆓' if is_free else '💲'), model_id))
 
         return sorted(result)
 
-class AIWorker(QThread):
-    """AI munkamenet kezelése"""
-    update_received = pyqtSignal(str)
-    response_completed = pyqtSignal(str)
-    error_occurred = pyqtSignal(str, int)
+SSE_DATA_PREFIX = b'data:'
+STREAM_EMIT_CHARS = 4096
+SSE_DONE = b'[DONE]'
+
+def iter_stream_lines(chunks):
+    """Nyers hálózati darabok sorokra bontása (a félbevágott sor a következő darabbal folytatódik)
+
+    Minden feldolgozott darab után None-t ad: eddig a pontig minden beérkezett adat kiküldhető.
+    """
+    tail = b''
+    for chunk in chunks:
+        if tail:
+            chunk = tail + chunk
+        lines = chunk.split(b'\n')
+        tail = lines.pop()
+        yield from lines
+        yield None
+    if tail:
+        yield tail
+
+def iter_sse_data(lines):
+    """SSE események `data:` tartalmának kinyerése a bejövő sorokból
+
+    A hálózati darabok végét jelző None-t továbbadja, hogy a hívó ott kiküldhesse a
+    függő szöveget és ellenőrizhesse a leállítást (keep-alive alatt is).
+    """
+    for line in lines:
+        if line is None:
+            yield None
+            continue
+        # Üres sor = eseményhatár, ':' kezdetű sor = keep-alive komment
+        if not line or line[0] == 0x3a:
+            continue
+        # A JSON a `data:` és az opcionális szóköz után kezdődik: egyetlen szeleteléssel
+        # vágjuk le, a sorvégi whitespace-t a JSON-olvasó elfogadja
+        start = line.find(b'{', 0, 8)
+        if start == 0 or (start > 0 and line.startswith(SSE_DATA_PREFIX)):
+            yield line[start:]
+        elif line.startswith(SSE_DATA_PREFIX) and line[5:].strip() == SSE_DONE:
+            return
+
+class AIWorker(QObject):
+    """AI munkamenet kezelése (állandó háttérszálon, megosztott HTTP kapcsolattal)"""
+    update_received = pyqtSignal(int, str)
+    response_completed = pyqtSignal(int, str)
+    error_occurred = pyqtSignal(int, str, int)
     truncated = pyqtSignal()
 
-    def __init__(self, api_key: str, messages: List[Dict], model: str,
-                 temperature: float, max_tokens: int):
+    def __init__(self, session: requests.Session):
         super().__init__()
-        self.api_key = api_key
-        self.messages = messages
-        self.model = model.split('|')[0].strip()
-        self.temperature = temperature
-        self.max_tokens = max_tokens
-        self.running = True
-        self.session = requests.Session()
-        self.session.headers.update({
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        })
-
-    def run(self):
+        # Az egyetlen futtatható kérés azonosítója (a GUI szál állítja); 0 = nincs aktív kérés
+        self.request_id = 0
+        self.session = session
+        self._resp = None
+
+    @pyqtSlot(int, str, list, str, float, int)
+    def run_request(self, request_id: int, api_key: str, messages: List[Dict], model: str,
+                    temperature: float, max_tokens: int):
+        # Várakozás közben leállított vagy felülírt kérés: el sem indítjuk
+        if request_id != self.request_id:
+            return
         payload = {
-            "model": self.model,
-            "messages": self.messages,
-            "temperature": self.temperature,
-            "max_tokens": self.max_tokens,
+            "model": model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
             "reasoning": {"exclude": True},
             "transforms": ["middle-out"],
             "usage": {"include": True},
@@ -199,66 +438,126 @@ class AIWorker(QThread):
         }
 
         try:
-            resp = self.session.post(API_URL, json=payload, stream=True, timeout=60)
-            if resp.status_code != 200:
-                try:
-                    resp.raise_for_status()
-                except requests.exceptions.HTTPError as e:
-                    err = resp.json().get('error', {}).get('message', 'Unknown error')
-                    self.error_occurred.emit(str(e), resp.status_code)
-                return
-
-            buffer = bytearray()
-            for chunk in resp.iter_lines():
-                if not self.running:
+            resp = self.session.post(API_URL, json=payload, stream=True, timeout=REQUEST_TIMEOUT,
+                                     headers={"Authorization": f"Bearer {api_key}"})
+            self._resp = resp
+            with resp:
+                # Kapcsolódás vagy újrapróbálás közben leállított kérés: a választ eldobjuk
+                if request_id != self.request_id:
+                    return
+                if resp.status_code != 200:
+                    try:
+                        resp.raise_for_status()
+                    except requests.exceptions.HTTPError as e:
+                        self.error_occurred.emit(request_id, str(e), resp.status_code)
                     return
-                if chunk:
-                    data = chunk[5:].strip() if chunk.startswith(b'data:') else chunk.strip()
-                    if not data.startswith(b'{'):
+
+                # Egy hálózati darab deltáit egyetlen jelben küldjük: a kötegelés legfeljebb
+                # egy darabnyi késést okoz, szünet vagy keep-alive alatt sem tartunk vissza szöveget
+                pending = []
+                pending_len = 0
+                for data in iter_sse_data(iter_stream_lines(resp.iter_content(chunk_size=None))):
+                    if request_id != self.request_id:
+                        return
+                    if data is None:
+                        if pending:
+                            self.update_received.emit(request_id, ''.join(pending))
+                            pending.clear()
+                            pending_len = 0
                         continue
-                    parsed = json.loads(data.decode('utf-8'))
+                    parsed = json_loads(data)
                     choices = parsed.get('choices', [{}])
                     if choices:
                         delta = choices[0].get('delta', {})
                         content = delta.get('content', '')
                         if content:
-                            buffer.extend(content.encode('utf-8'))
-                            self.update_received.emit(buffer.decode('utf-8', errors='replace'))
-                            buffer.clear()
+                            pending.append(content)
+                            pending_len += len(content)
+                            if pending_len >= STREAM_EMIT_CHARS:
+                                self.update_received.emit(request_id, ''.join(pending))
+                                pending.clear()
+                                pending_len = 0
                         finish_reason = choices[0].get('finish_reason')
                         if finish_reason == 'length':
                             self.truncated.emit()
 
-            if buffer:
-                self.update_received.emit(buffer.decode('utf-8', errors='replace'))
+                if pending and request_id == self.request_id:
+                    self.update_received.emit(request_id, ''.join(pending))
 
-            self.response_completed.emit("Kész!")
+            if request_id == self.request_id:
+                self.response_completed.emit(request_id, "Kész!")
         except requests.RequestException as e:
-            self.error_occurred.emit(f"Network error: {e}", 500)
+            if request_id == self.request_id:
+                self.error_occurred.emit(request_id, f"Network error: {e}", 500)
         except Exception as e:
-            self.error_occurred.emit(f"Unexpected error: {e}", 500)
+            if request_id == self.request_id:
+                self.error_occurred.emit(request_id, f"Unexpected error: {e}", 500)
+        finally:
+            self._resp = None
 
     def stop(self):
-        self.running = False
-        self.session.close()
+        """Aktív kérés leállítása (a GUI szálról hívva)"""
+        self.request_id = 0
+        # A folyamatban lévő válasz lezárása: a blokkoló olvasás nem vár a következő sorig.
+        # Kapcsolódás és újrapróbálás közben még nincs válasz; ott a post visszatérése után lépünk ki
+        resp = self._resp
+        if resp is not None:
+            try:
+                resp.close()
+            except Exception:
+                pass
 
-from PyQt5.QtWidgets import QWidget, QVBoxLayout, QPlainTextEdit
-from PyQt5.QtGui import QColor
-from PyQt5.QtCore import Qt
-try:
-    from PyQt5.Qsci import QsciScintilla, QsciLexerPython, QsciLexerCPP, QsciLexerJava, QsciLexerJavaScript, QsciLexerHTML, QsciLexerXML, QsciLexerJSON, QsciLexerSQL, QsciLexerBash
-    HAS_SCINTILLA = True
-except ImportError:
-    HAS_SCINTILLA = False
+@functools.lru_cache(maxsize=1)
+def load_scintilla():
+    """QScintilla betöltése az első kódfülnél (None, ha nincs telepítve)"""
+    try:
+        from PyQt5 import Qsci
+    except ImportError:
+        return None
+    return Qsci
 
 class CodeEditor(QWidget):
     """Kódszerkesztő widget"""
+    # Nyelv -> QScintilla lexer osztály neve (a modul csak az első kódfülnél töltődik be)
+    _LEXER_NAMES = {
+        "python": "QsciLexerPython",
+        "cpp": "QsciLexerCPP",
+        "c++": "QsciLexerCPP",
+        "java": "QsciLexerJava",
+        "javascript": "QsciLexerJavaScript",
+        "js": "QsciLexerJavaScript",
+        "typescript": "QsciLexerJavaScript",
+        "ts": "QsciLexerJavaScript",
+        "php": "QsciLexerHTML",
+        "html": "QsciLexerHTML",
+        "xml": "QsciLexerXML",
+        "json": "QsciLexerJSON",
+        "sql": "QsciLexerSQL",
+        "bash": "QsciLexerBash",
+        "sh": "QsciLexerBash"
+    }
+    # Lexer példányok osztályonként, az összes szerkesztő között megosztva
+    _lexer_cache = {}
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.layout = QVBoxLayout(self)
         self.layout.setContentsMargins(5, 5, 5, 5)
-
-        if HAS_SCINTILLA:
+        # A tényleges szerkesztő csak a fül első megjelenítésekor jön létre
+        self.editor = None
+        self._qsci = None
+        self._language = None
+        self._text = ""
+
+    def showEvent(self, event):
+        if self.editor is None:
+            self._create_editor()
+        super().showEvent(event)
+
+    def _create_editor(self):
+        self._qsci = load_scintilla()
+        if self._qsci:
+            QsciScintilla = self._qsci.QsciScintilla
             self.editor = QsciScintilla()
             self.editor.setAutoIndent(True)
             self.editor.setIndentationGuides(True)
@@ -274,45 +573,45 @@ class CodeEditor(QWidget):
             self.editor = QPlainTextEdit()
             self.editor.setReadOnly(True)
 
-        # A QPlainTextEdit háttérszínének beállítása
-        self.editor.setStyleSheet("background-color:#ced6cb;")
+        # Háttérszín a közös stíluslapból (#codeEditor), nem szerkesztőnkénti stíluslappal
+        self.editor.setObjectName("codeEditor")
 
         self.layout.addWidget(self.editor)
+        if self._language:
+            self._apply_language(self._language)
+        self.setText(self._text)
 
     def set_language(self, language):
-        if not HAS_SCINTILLA:
+        self._language = language
+        if self.editor is not None:
+            self._apply_language(language)
+
+    def _apply_language(self, language):
+        if not self._qsci:
             return
-        lexer_map = {
-            "python": QsciLexerPython,
-            "cpp": QsciLexerCPP,
-            "c++": QsciLexerCPP,
-            "java": QsciLexerJava,
-            "javascript": QsciLexerJavaScript,
-            "js": QsciLexerJavaScript,
-            "typescript": QsciLexerJavaScript,
-            "ts": QsciLexerJavaScript,
-            "php": QsciLexerHTML,
-            "html": QsciLexerHTML,
-            "xml": QsciLexerXML,
-            "json": QsciLexerJSON,
-            "sql": QsciLexerSQL,
-            "bash": QsciLexerBash,
-            "sh": QsciLexerBash
-        }
-        lexer = lexer_map.get(language.lower())
-        if lexer:
-            self.editor.setLexer(lexer())
-        else:
+        lexer_name = self._LEXER_NAMES.get(language.lower())
+        if not lexer_name:
             print(f"Lexer not found for language: {language}")
+            return
+        lexer = self._lexer_cache.get(lexer_name)
+        if lexer is None:
+            lexer = self._lexer_cache[lexer_name] = getattr(self._qsci, lexer_name)()
+        self.editor.setLexer(lexer)
 
     def setText(self, text):
-        if HAS_SCINTILLA:
+        self._text = text
+        if self.editor is None:
+            return
+        if self._qsci:
             self.editor.setText(text)
         else:
             self.editor.setPlainText(text)
 
     def text(self):
-        return self.editor.text() if HAS_SCINTILLA else self.editor.toPlainText()
+        if self.editor is None:
+            return self._text
+        return self.editor.text() if self._qsci else self.editor.toPlainText()
+
 class SearchDialog(QDialog):
     """Keresés dialógusablak"""
     def __init__(self, parent=None):
@@ -324,6 +623,10 @@ class SearchDialog(QDialog):
         self.form = QFormLayout()
 
         self.search_edit = QLineEdit()
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.reset_cursor)
         self.search_edit.textChanged.connect(self.on_search_text_changed)
         self.form.addRow("Keresés:", self.search_edit)
 
@@ -345,6 +648,9 @@ class SearchDialog(QDialog):
         self.cursor = self.editor.textCursor()
 
     def on_search_text_changed(self, text):
+        self.search_timer.start()
+
+    def reset_cursor(self):
         self.cursor = self.editor.textCursor()
         self.cursor.setPosition(0)
 
@@ -358,6 +664,10 @@ class SearchDialog(QDialog):
         text = self.search_edit.text()
         if not text:
             return
+        # Ha a gépelés utáni visszaállítás még függőben van, most hajtjuk végre
+        if self.search_timer.isActive():
+            self.search_timer.stop()
+            self.reset_cursor()
         cursor = self.editor.document().find(text, self.cursor, flags)
         if not cursor.isNull():
             self.editor.setTextCursor(cursor)
@@ -371,31 +681,125 @@ class TextReceiver(QObject):
     """Szövegkezelő osztály"""
     update_text = pyqtSignal(str)
 
+class FileTaskSignals(QObject):
+    """Háttér fájlművelet jelzései"""
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+class FileTask(QRunnable):
+    """Fájlművelet futtatása a QThreadPool-on"""
+    def __init__(self, func, *args):
+        super().__init__()
+        self.func = func
+        self.args = args
+        self.signals = FileTaskSignals()
+
+    def run(self):
+        try:
+            result = self.func(*self.args)
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
 class MainWindow(QWidget):
     """Főablak osztály"""
+    request_worker = pyqtSignal(int, str, list, str, float, int)
+    _app_icon = None
+
     def __init__(self):
         super().__init__()
-        self.settings = SettingsManager()
-        self.encryption_manager = EncryptionManager()
-        self.network_manager = NetworkManager()
-        self.worker = None
+        self.settings = settings
+        self.encryption_manager = encryptor
+        self.network_manager = NetworkManager(self)
+        self.network_manager.models_loaded.connect(self.populate_models)
+        self.network_manager.error_occurred.connect(self.show_network_error)
+        # Megosztott HTTP munkamenet: a kérések újrahasználják a TLS kapcsolatot
+        self.http_session = requests.Session()
+        self.http_session.mount("https://", HTTPAdapter(
+            pool_connections=4, pool_maxsize=8,
+            max_retries=Retry(total=3, read=0, backoff_factor=1,
+                              status_forcelist=RETRY_STATUSES,
+                              allowed_methods=frozenset({"GET", "POST"}),
+                              respect_retry_after_header=False,
+                              raise_on_status=False)))
+        self.http_session.headers.update({"Content-Type": "application/json"})
+        self.worker_thread = QThread(self)
+        self.worker = AIWorker(self.http_session)
+        self.worker.moveToThread(self.worker_thread)
+        self.request_worker.connect(self.worker.run_request)
+        self.worker.update_received.connect(self.handle_update)
+        self.worker.response_completed.connect(self.request_completed)
+        self.worker.error_occurred.connect(self.show_error)
+        self.worker.truncated.connect(self.show_truncated_message)
+        # Csak a hálózati szál kap magasabb prioritást, nem az egész folyamat
+        self.worker_thread.start(QThread.HighPriority)
+        self._last_models = None
 
         self.history = []
+        self._autosave_path = None
+        self._autosaved_len = 0
+        # Egyszálas pool: a hozzáfűzések sorrendje megmarad
+        self.autosave_pool = QThreadPool(self)
+        self.autosave_pool.setMaxThreadCount(1)
+        self._history_files: List[str] = []
+        self._history_dir_mtime = None
+        self._menu_files = None
         self.current_prompt = ""
         self.code_blocks = []
-        self.buffered_text = ""
+        self._code_scan_pos = 0
+        self._code_scan_len = 0
+        self._code_hashes = set()
+        self._fence_open = False
+        self._fence_ticks = 0
+        self._buffered_parts: List[str] = []
+        self._assistant_parts: List[str] = []
         self.update_interval = 80
         self.text_receiver = TextReceiver()
         self.text_receiver.update_text.connect(self.append_to_chat)
         self.is_generating = False
+        self._request_id = 0
         self.code_tab_count = 0
+        self._chat_bg_name = None
+        self._trunc_dialog = None
+        self.search_dialog = None
+        self._active_model = None
+        self._search_term = None
+        self._search_re = None
+
+        # Újrafelhasznált karakterformátumok
+        self._plain_fmt = QTextCharFormat()
+        self._user_fmt = QTextCharFormat()
+        self._user_fmt.setForeground(QColor("#3498db"))
+        self._assistant_fmt = QTextCharFormat()
+        self._assistant_fmt.setForeground(QColor("#2ecc71"))
+        self._search_fmt = QTextCharFormat()
+        self._search_fmt.setBackground(QColor("yellow"))
+        self._bg_idle = QColor(52, 73, 94)  # #34495e - alap szín
+        self._bg_generating = QColor(30, 30, 30)  # generálás szín
+        # Háttérszín-átmenet: az interpolációt a Qt végzi, ~1 s alatt
+        self._bg_anim = QVariantAnimation(self)
+        self._bg_anim.setDuration(1000)
+        self._bg_anim.valueChanged.connect(self.set_chat_background)
 
         self.setup_ui()
         self.setup_connections()
         self.load_settings()
         self.setWindowIcon(self.get_application_icon())
+        # Egyszeri időzítő: csak akkor ébred, ha van kiírandó szöveg
         self.update_timer = QTimer(self)
+        self.update_timer.setSingleShot(True)
         self.update_timer.timeout.connect(self.flush_buffer)
+        # Gyors egymás utáni válaszoknál egyetlen mentés és menüfrissítés
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.setSingleShot(True)
+        self.autosave_timer.setInterval(AUTOSAVE_DELAY_MS)
+        self.autosave_timer.timeout.connect(self.flush_autosave)
+        # Csonkolt válasz automatikus folytatása; új kérés, leállítás vagy törlés megszakítja
+        self.continue_timer = QTimer(self)
+        self.continue_timer.setSingleShot(True)
+        self.continue_timer.setInterval(3000)
+        self.continue_timer.timeout.connect(self.continue_request)
 
     def setup_ui(self):
         """Felület létrehozása"""
@@ -476,16 +880,23 @@ class MainWindow(QWidget):
 
         self.search_bar = QLineEdit()
         self.search_bar.setPlaceholderText("Keresés a chatben...")
-        self.search_bar.textChanged.connect(self.search_chat)
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(150)
+        self.search_timer.timeout.connect(self.run_pending_search)
+        self.search_bar.textChanged.connect(self.schedule_search)
         right_layout.addWidget(self.search_bar)
 
         self.tab_widget = QTabWidget()
         self.tab_widget.setTabsClosable(True)
         self.tab_widget.tabCloseRequested.connect(self.close_tab)
 
-        self.chat_display = QTextEdit()
+        # QPlainTextEdit: soronként, lustán tördel, így hosszú chatnél is olcsó a hozzáfűzés
+        self.chat_display = QPlainTextEdit()
         self.chat_display.setReadOnly(True)
         self.chat_display.setFont(QFont("Segoe UI", 10))
+        self.chat_display.setUndoRedoEnabled(False)
+        self._chat_cursor = QTextCursor(self.chat_display.document())
         self.tab_widget.addTab(self.chat_display, "Chat")
 
         self.copy_btn = QPushButton("Kód másolása")
@@ -527,6 +938,7 @@ class MainWindow(QWidget):
         toolbar.addSeparator()
 
         self.history_menu = QMenu("Előzmények", self)
+        self.history_menu.triggered.connect(self.on_history_action)
         menu_btn = QToolButton()
         menu_btn.setText("Előzmények")
         menu_btn.setMenu(self.history_menu)
@@ -560,8 +972,11 @@ class MainWindow(QWidget):
 
     def show_search_dialog(self):
         """Keresés dialógus megjelenítése"""
-        self.search_dialog = SearchDialog(self)
+        if self.search_dialog is None:
+            self.search_dialog = SearchDialog(self)
         self.search_dialog.show()
+        self.search_dialog.raise_()
+        self.search_dialog.activateWindow()
 
     def update_copy_button_state(self, index):
         """Másolás gomb állapotának frissítése"""
@@ -569,45 +984,9 @@ class MainWindow(QWidget):
 
     def apply_dark_theme(self):
         """Sötét téma alkalmazása"""
-        palette = QPalette()
-        palette.setColor(QPalette.Window, QColor("#2c3e50"))
-        palette.setColor(QPalette.WindowText, QColor("#ecf0f1"))
-        palette.setColor(QPalette.Base, QColor("#34495e"))
-        palette.setColor(QPalette.AlternateBase, QColor("#2c3e50"))
-        palette.setColor(QPalette.ToolTipBase, QColor("#34495e"))
-        palette.setColor(QPalette.ToolTipText, QColor("#ecf0f1"))
-        palette.setColor(QPalette.Text, QColor("#ecf0f1"))
-        palette.setColor(QPalette.Button, QColor("#3498db"))
-        palette.setColor(QPalette.ButtonText, QColor("#ffffff"))
-        palette.setColor(QPalette.Highlight, QColor("#3498db"))
-        palette.setColor(QPalette.HighlightedText, QColor("#ffffff"))
-
         app.setStyle("Fusion")
-        self.setPalette(palette)
-        self.setStyleSheet("""
-            QWidget { background-color:#2c3e50; color:#ecf0f1; font-family:"Segoe UI"; font-size:14px; }
-            QTextEdit, QPlainTextEdit { background:#34495e; color:#ecf0f1; border:1px solid #2c3e50; border-radius:8px; padding:12px; }
-            QComboBox, QDoubleSpinBox, QSpinBox, QLineEdit { background:#34495e; color:#ecf0f1; border:1px solid #2c3e50; border-radius:8px; padding:8px; }
-            QPushButton { background:#3498db; color:white; padding:10px 20px; border-radius:8px; border:none; font-weight:bold; }
-            QPushButton:hover { background:#2980b9; }
-            QPushButton:pressed { background:#2471a3; }
-            QPushButton:disabled { background:#7f8c8d; color:#bdc3c7; }
-            QStatusBar { color:#95a5a6; font-size:12px; background:#232f34; border-top:1px solid #2c3e50; }
-            QTabWidget::pane { border:1px solid #2c3e50; background:#232f34; border-radius:8px; }
-            QTabBar::tab { background:#34495e; color:#ecf0f1; padding:8px 16px; border-top-left-radius:8px; border-top-right-radius:8px; }
-            QTabBar::tab:selected { background:#2c3e50; }
-            QGroupBox { border:1px solid #2c3e50; border-radius:8px; margin-top:1em; padding:10px; }
-            QGroupBox::title { left:10px; padding:0 3px; color:#ecf0f1; }
-            QToolBar { background:#232f34; padding:5px; }
-            QToolButton { background:transparent; border:none; padding:5px; color:#ecf0f1; }
-            QToolButton:hover { background:#34495e; border-radius:4px; }
-            QMenu { background:#34495e; color:#ecf0f1; border:1px solid #2c3e50; border-radius:4px; }
-            QMenu::item { padding:8px 20px; }
-            QMenu::item:selected { background:#3498db; }
-            QScrollBar:vertical { background:#232f34; width:10px; }
-            QScrollBar::handle:vertical { background:#3498db; min-height:20px; border-radius:5px; }
-            QScrollBar::add-line:vertical, QScrollBar::sub-line:vertical { height:0px; }
-        """)
+        self.setPalette(dark_palette())
+        self.setStyleSheet(DARK_QSS)
 
     def load_settings(self):
         """Beállítások betöltése"""
@@ -621,8 +1000,7 @@ class MainWindow(QWidget):
         self.move(QApplication.desktop().screenGeometry().center() - self.frameGeometry().center())
         self.temp_spin.setValue(float(self.settings.get('temperature', DEFAULT_TEMP)))
         tokens = int(self.settings.get('max_tokens', 4096))
-        idx = next((i for i, t in enumerate(TOKEN_OPTIONS) if t == tokens), DEFAULT_TOKENS_INDEX)
-        self.token_combo.setCurrentIndex(idx)
+        self.token_combo.setCurrentIndex(TOKEN_INDEX.get(tokens, DEFAULT_TOKENS_INDEX))
         self.free_check.setChecked(self.settings.get('free_models', 'true') == 'true')
 
     def save_settings(self):
@@ -634,50 +1012,139 @@ class MainWindow(QWidget):
 
     def closeEvent(self, event):
         """Ablak bezárásakor"""
+        self.autosave_timer.stop()
         self.autosave_history()
         self.save_settings()
-        if self.worker and self.worker.isRunning():
-            self.worker.stop()
-            self.worker.wait()
+        self.settings.sync()
+        self.worker.stop()
+        self.worker_thread.quit()
+        self.worker_thread.wait()
+        self.http_session.close()
+        self.network_manager.close()
+        self.autosave_pool.waitForDone()
+        QThreadPool.globalInstance().waitForDone()
         super().closeEvent(event)
 
     def autosave_history(self):
-        """Automatikus előzmények mentése"""
-        if not self.history:
+        """Automatikus előzmények mentése (csak az új üzenetek hozzáfűzése)"""
+        new_messages = self.history[self._autosaved_len:]
+        if not new_messages:
             return
-        ts = time.strftime("%Y%m%d-%H%M%S")
-        fn = os.path.join(self.settings.history_dir, f"autosave_{ts}.json")
-        try:
-            with open(fn, 'w', encoding='utf-8') as f:
-                json.dump(self.history, f, ensure_ascii=False, indent=2)
-        except Exception:
-            pass
+        if not self._autosave_path:
+            ts = time.strftime("%Y%m%d-%H%M%S")
+            self._autosave_path = os.path.join(self.settings.history_dir, f"autosave_{ts}.jsonl")
+        path, start = self._autosave_path, self._autosaved_len
+        # Előre léptetjük, hogy a következő mentés ne írja újra ezeket; hiba esetén visszaállítjuk
+        self._autosaved_len = len(self.history)
+        self.run_file_task(append_jsonl_file, (path, new_messages),
+                           on_error=lambda e: self.autosave_failed(path, start, e),
+                           pool=self.autosave_pool)
+
+    def autosave_failed(self, path: str, start: int, error: str):
+        """Sikertelen automatikus mentés: az üzenetek a következő mentéskor újra sorra kerülnek"""
+        if path == self._autosave_path:
+            self._autosaved_len = min(self._autosaved_len, start)
+        self.status_bar.showMessage(f"Automatikus mentési hiba: {error}")
+
+    def flush_autosave(self):
+        """Késleltetett automatikus mentés azonnali végrehajtása"""
+        self.autosave_timer.stop()
+        self.autosave_history()
+        self.update_history_menu()
+
+    def reset_autosave(self, path=None):
+        """Új automatikus mentési munkamenet kezdése"""
+        self._autosave_path = path
+        self._autosaved_len = len(self.history) if path else 0
+
+    @staticmethod
+    def read_history(path):
+        """Előzményfájl beolvasása (.json vagy soronkénti .jsonl)"""
+        with open(path, 'rb', buffering=IO_BUFFER_SIZE) as f:
+            if path.endswith('.jsonl'):
+                history = [json_loads(line) for line in f if line.strip()]
+            else:
+                history = json_loads(f.read())
+        # A szerepnevek közös példányt kapnak, ne üzenetenként külön sztringet
+        for m in history:
+            role = m.get('role')
+            if isinstance(role, str):
+                m['role'] = sys.intern(role)
+        return history
+
+    def list_history_files(self):
+        """Előzményfájlok listája (csak a könyvtár változásakor olvassa újra)"""
+        history_dir = self.settings.history_dir
+        mtime = os.stat(history_dir).st_mtime_ns
+        if mtime != self._history_dir_mtime:
+            with os.scandir(history_dir) as it:
+                self._history_files = sorted(e.name for e in it
+                                             if e.is_file(follow_symlinks=False)
+                                             and e.name.endswith(('.json', '.jsonl')))
+            self._history_dir_mtime = mtime
+        return self._history_files
 
     def update_history_menu(self):
         """Előzmények menü frissítése"""
+        files = self.list_history_files()
+        if files == self._menu_files:
+            return
+        self._menu_files = files
         self.history_menu.clear()
-        files = sorted([f for f in os.listdir(self.settings.history_dir) if f.endswith('.json')])
         for f in files[-MAX_HISTORY:]:
             act = self.history_menu.addAction(f)
-            act.triggered.connect(lambda _, fn=f: self.load_history_file(fn))
+            act.setData(f)
         if not files:
             self.history_menu.addAction("Nincs előzmény")
 
+    def on_history_action(self, action):
+        """Előzmény menüpont kiválasztása"""
+        filename = action.data()
+        if filename:
+            self.load_history_file(filename)
+
     def load_history_file(self, filename):
         """Előzmény betöltése"""
         path = os.path.join(self.settings.history_dir, filename)
+        self.run_file_task(
+            self.read_history, (path,),
+            lambda history: self.show_loaded_history(
+                history, path if path.endswith('.jsonl') else None,
+                f"Előzmény betöltve: {filename}", "Előzmény betöltési hiba"),
+            lambda e: QMessageBox.critical(self, "Előzmény betöltési hiba", e))
+
+    def show_loaded_history(self, history, autosave_path, message, error_title):
+        """Betöltött előzmény megjelenítése"""
+        # Az előző beszélgetés még nem mentett része ne vesszen el
+        if self.autosave_timer.isActive():
+            self.flush_autosave()
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                self.history = json.load(f)
+            self.history = history
+            self.reset_autosave(autosave_path)
             self.clear_chat_display()
-            for m in self.history:
-                role = m.get('role', 'user')
-                content = m.get('content', '')
-                self.append_to_chat(f"**{role.capitalize()}:** {content}\n\n", role=role)
+            # Egyetlen szerkesztési blokk: egy újratördelés az összes üzenetre
+            cursor = QTextCursor(self.chat_display.document())
+            cursor.beginEditBlock()
+            try:
+                for m in self.history:
+                    role = m.get('role', 'user')
+                    content = m.get('content', '')
+                    cursor.insertText(f"**{role.capitalize()}:** {content}\n\n", self.chat_format(role))
+            finally:
+                cursor.endEditBlock()
             self.process_code_blocks()
-            self.status_bar.showMessage(f"Előzmény betöltve: {filename}")
+            self.status_bar.showMessage(message)
         except Exception as e:
-            QMessageBox.critical(self, "Előzmény betöltési hiba", str(e))
+            QMessageBox.critical(self, error_title, str(e))
+
+    def run_file_task(self, func, args, on_finished=None, on_error=None, pool=None):
+        """Fájlművelet indítása háttérszálon"""
+        task = FileTask(func, *args)
+        if on_finished:
+            task.signals.finished.connect(on_finished)
+        if on_error:
+            task.signals.error.connect(on_error)
+        (pool or QThreadPool.globalInstance()).start(task)
 
     def clear_history(self):
         """Előzmények törlése"""
@@ -685,20 +1152,30 @@ class MainWindow(QWidget):
                                      "Biztosan törlöd az összes előzményt?",
                                      QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
         if reply == QMessageBox.Yes:
-            try:
-                for f in os.listdir(self.settings.history_dir):
-                    p = os.path.join(self.settings.history_dir, f)
-                    if os.path.isfile(p):
-                        os.unlink(p)
-                self.history = []
-                self.update_history_menu()
-                QMessageBox.information(self, "Törlés", "Az összes előzmény törölve.")
-            except Exception as e:
-                QMessageBox.critical(self, "Hiba", str(e))
+            self.cancel_continue()
+            # Függőben lévő automatikus mentések ne írjanak a törlés közben
+            self.autosave_timer.stop()
+            self.autosave_pool.waitForDone()
+            self.run_file_task(remove_files, (self.settings.history_dir,),
+                               self.history_cleared,
+                               lambda e: QMessageBox.critical(self, "Hiba", e))
+
+    def history_cleared(self, _result):
+        """Előzmények törlése után"""
+        self.history = []
+        self.reset_autosave()
+        self.update_history_menu()
+        QMessageBox.information(self, "Törlés", "Az összes előzmény törölve.")
 
     def load_api_keys(self):
         """API kulcsok betöltése"""
         data = self.settings.get('api_keys', {})
+        if self.encryption_manager.key_lost and data:
+            self.encryption_manager.key_lost = False
+            QMessageBox.warning(self, "Titkosítókulcs",
+                                "A tárolt titkosítókulcs nem fejthető vissza, új kulcs készült.\n"
+                                "A mentett API kulcsokat újra meg kell adni; a régi kulcs "
+                                "biztonsági mentésként megmaradt.")
         self.key_combo.clear()
         for name, enc in data.items():
             try:
@@ -727,7 +1204,7 @@ class MainWindow(QWidget):
             name = name_edit.text().strip()
             key = key_edit.text().strip()
             if name and key:
-                data = self.settings.get('api_keys', {})
+                data = dict(self.settings.get('api_keys', {}))
                 data[name] = self.encryption_manager.encrypt(key)
                 self.settings.set('api_keys', data)
                 self.load_api_keys()
@@ -735,25 +1212,28 @@ class MainWindow(QWidget):
 
     def refresh_models(self):
         """Modellek frissítése"""
-        try:
-            self.network_manager.models_loaded.disconnect(self.populate_models)
-        except TypeError:
-            pass
-        self.model_combo.clear()
         self.network_manager.free_only = self.free_check.isChecked()
-        self.network_manager.models_loaded.connect(self.populate_models)
-        self.network_manager.error_occurred.connect(self.show_error)
-        self.network_manager.start()
+        self.network_manager.fetch_models()
 
     def populate_models(self, models):
         """Modellek betöltése"""
-        self.model_combo.addItems(models)
+        if models == self._last_models:
+            return
+        self._last_models = models
+        self.model_combo.setUpdatesEnabled(False)
+        self.model_combo.blockSignals(True)
+        self.model_combo.clear()
+        for label, model_id in models:
+            self.model_combo.addItem(label, model_id)
+        self.model_combo.blockSignals(False)
+        self.model_combo.setUpdatesEnabled(True)
         if self.model_combo.count():
             last = self.settings.get('last_model')
-            if last and last in models:
-                self.model_combo.setCurrentIndex(models.index(last))
-            else:
-                self.model_combo.setCurrentIndex(0)
+            # Régebbi beállításban a teljes címke van elmentve
+            idx = self.model_combo.findData(last) if last else -1
+            if idx < 0 and last:
+                idx = self.model_combo.findText(last)
+            self.model_combo.setCurrentIndex(max(idx, 0))
 
     def upload_file(self):
         """Fájl feltöltése"""
@@ -761,17 +1241,17 @@ class MainWindow(QWidget):
                                             "", "Minden fájl (*);;Szövegfájlok (*.txt);;Kód (*.py *.c *.cpp *.java)",
                                             options=QFileDialog.Options())
         if fp:
-            try:
-                with open(fp, 'r', encoding='utf-8') as f:
-                    txt = f.read()
-                if len(txt) > MAX_FILE_SIZE:
-                    QMessageBox.warning(self, "Túl nagy fájl",
-                                        f"Fájl mérete ({len(txt)} karakter) meghaladja a {MAX_FILE_SIZE} karaktert.")
-                    return
-                self.input_edit.setPlainText(
-                    f"A következő kód van feltöltve:\n```plaintext\n{txt}\n```\n\nKérés:")
-            except Exception as e:
-                QMessageBox.critical(self, "Hiba", f"Fájl olvasási hiba: {e}")
+            self.run_file_task(read_text_file, (fp, MAX_FILE_SIZE), self.show_uploaded_file,
+                               lambda e: QMessageBox.critical(self, "Hiba", f"Fájl olvasási hiba: {e}"))
+
+    def show_uploaded_file(self, txt):
+        """Feltöltött fájl beillesztése a kérésbe"""
+        if txt is None:
+            QMessageBox.warning(self, "Túl nagy fájl",
+                                f"Fájl mérete meghaladja a {MAX_FILE_SIZE} karaktert.")
+            return
+        self.input_edit.setPlainText(
+            f"A következő kód van feltöltve:\n```plaintext\n{txt}\n```\n\nKérés:")
 
     def send_request(self):
         """Kérés küldése"""
@@ -779,8 +1259,17 @@ class MainWindow(QWidget):
 
     def continue_request(self):
         """Kérés folytatása"""
+        self.cancel_continue()
+        if self.is_generating:
+            return
         self.start_request(True)
 
+    def cancel_continue(self):
+        """Függőben lévő automatikus folytatás megszakítása"""
+        self.continue_timer.stop()
+        if self._trunc_dialog is not None:
+            self._trunc_dialog.hide()
+
     def start_request(self, continue_conv: bool):
         """Kérés kezdeményezése"""
         self.current_prompt = self.input_edit.toPlainText().strip()
@@ -791,11 +1280,12 @@ class MainWindow(QWidget):
         if not api_key:
             QMessageBox.warning(self, "Hiányzó API kulcs", "Kérlek, add meg az API kulcsot!")
             return
-        model = self.model_combo.currentText()
+        model = self.model_combo.currentData()
         if not model:
             QMessageBox.warning(self, "Hiányzó modell", "Kérlek, válassz egy modellt!")
             return
 
+        self.cancel_continue()
         self.set_ui_state(False)
         self.is_generating = True
         if not continue_conv:
@@ -808,6 +1298,9 @@ class MainWindow(QWidget):
                 "content": f"\nKérlek komment nélkül folytasd a kódot!\n"
             })
 
+        self._assistant_parts.clear()
+        self._fence_open = False
+        self._fence_ticks = 0
         self.status_bar.showMessage("Kérés folyamatban…")
         self.start_worker(api_key, model)
         self.set_generating_background(True)
@@ -821,66 +1314,104 @@ class MainWindow(QWidget):
         self.stop_btn.setEnabled(not enabled)
 
     def start_worker(self, api_key, model):
-        """Munkamenet indítása"""
-        self.worker = AIWorker(
+        """Munkamenet indítása a háttérszálon"""
+        self._active_model = model
+        self._request_id += 1
+        self.worker.request_id = self._request_id
+        self.request_worker.emit(
+            self._request_id,
             api_key,
-            self.history,
+            list(self.history),
             model,
             self.temp_spin.value(),
             self.token_combo.currentData()
         )
-        self.worker.update_received.connect(self.handle_update)
-        self.worker.response_completed.connect(self.request_completed)
-        self.worker.error_occurred.connect(self.show_error)
-        self.worker.truncated.connect(self.show_truncated_message)
-        self.worker.start()
 
-    def handle_update(self, text: str):
+    def handle_update(self, request_id: int, text: str):
         """Válaszkezelés"""
-        self.buffered_text += text
+        if not self.is_generating or request_id != self._request_id:
+            return
+        self._buffered_parts.append(text)
+        self._assistant_parts.append(text)
         if not self.update_timer.isActive():
             self.update_timer.start(self.update_interval)
 
     def flush_buffer(self):
         """Pufferválasz kiürítése"""
-        if self.buffered_text:
-            self.text_receiver.update_text.emit(self.buffered_text)
-            self.buffered_text = ""
-        if self.worker and (not self.worker.isRunning() or not self.is_generating):
-            self.update_timer.stop()
+        if self._buffered_parts:
+            text = ''.join(self._buffered_parts)
+            self._buffered_parts.clear()
+            self.text_receiver.update_text.emit(text)
+            # Lezárt kódblokk már generálás közben is fület kap; csak az új szöveget vizsgáljuk
+            if '`' in text and self.scan_fences(text):
+                self.process_code_blocks()
+
+    def scan_fences(self, text: str) -> bool:
+        """Kódkerítések követése az új szövegben; True, ha kódblokk zárult le"""
+        # Az előző darab végén maradt backtickek: a kerítés darabokra is eshet
+        text = '`' * self._fence_ticks + text
+        closed = False
+        pos = text.find('```')
+        end = 0
+        while pos != -1:
+            self._fence_open = not self._fence_open
+            closed = closed or not self._fence_open
+            end = pos + 3
+            pos = text.find('```', end)
+        tail = text[end:]
+        self._fence_ticks = min(len(tail) - len(tail.rstrip('`')), 2)
+        return closed
+
+    def chat_format(self, role: str = None):
+        """Szerephez tartozó karakterformátum"""
+        if role == "user":
+            return self._user_fmt
+        if self.is_generating:
+            return self._assistant_fmt
+        return self._plain_fmt
 
     def append_to_chat(self, text: str, role: str = None):
         """Szöveg hozzáadása a chathez"""
-        cursor = self.chat_display.textCursor()
+        scroll = self.chat_display.verticalScrollBar()
+        at_bottom = scroll.value() >= scroll.maximum()
+        cursor = self._chat_cursor
         cursor.movePosition(QTextCursor.End)
-        fmt = QTextCharFormat()
-        if role == "user":
-            fmt.setForeground(QColor("#3498db"))
-        elif self.is_generating:
-            fmt.setForeground(QColor("#2ecc71"))
-        cursor.insertText(text, fmt)
-        self.chat_display.ensureCursorVisible()
-        self.process_code_blocks()
+        cursor.insertText(text, self.chat_format(role))
+        if at_bottom:
+            scroll.setValue(scroll.maximum())
 
-    def request_completed(self, status: str):
+    def request_completed(self, request_id: int, status: str):
         """Kérés befejezése"""
-        if self.buffered_text:
-            self.text_receiver.update_text.emit(self.buffered_text)
-            self.buffered_text = ""
-        assistant_text = self.chat_display.toPlainText().split("Felhasználó:")[-1].strip()
+        # Leállított vagy elavult kérés késve érkező jelzése
+        if not self.is_generating or request_id != self._request_id:
+            return
+        if self._buffered_parts:
+            self.text_receiver.update_text.emit(''.join(self._buffered_parts))
+            self._buffered_parts.clear()
+        self.process_code_blocks()
+        assistant_text = ''.join(self._assistant_parts).strip()
+        self._assistant_parts.clear()
         self.history.append({"role": "assistant", "content": assistant_text})
         self.set_ui_state(True)
         self.status_bar.showMessage(status)
-        self.update_history_menu()
-        self.settings.set('last_model', self.model_combo.currentText())
-        self.autosave_history()
+        self.settings.set('last_model', self._active_model)
+        self.autosave_timer.start()
         self.is_generating = False
         self.set_generating_background(False)
         self.input_edit.clear()
          
 
-    def show_error(self, msg: str, code: int = None):
-        """Hiba megjelenítése"""
+    def show_network_error(self, msg: str):
+        """Modellista-lekérés hibájának megjelenítése (a futó kérést nem érinti)"""
+        e = f"Hiba: {msg}"
+        QMessageBox.critical(self, "Hiba", e)
+        self.status_bar.showMessage(e)
+
+    def show_error(self, request_id: int, msg: str, code: int = None):
+        """Kéréshiba megjelenítése"""
+        # Leállított vagy elavult kérés késve érkező hibája
+        if not self.is_generating or request_id != self._request_id:
+            return
         e = f"Hiba: {msg}"
         if code:
             e += f" (Státusz: {code})"
@@ -888,29 +1419,36 @@ class MainWindow(QWidget):
         self.status_bar.showMessage(e)
         self.set_ui_state(True)
         self.is_generating = False
+        self._assistant_parts.clear()
         self.set_generating_background(False)
 
     def show_truncated_message(self):
         """Válasz folytatása"""
-        dlg = QDialog(self)
-        dlg.setWindowTitle("Folytatás...")
-        dlg.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
-        dlg.setAttribute(Qt.WA_DeleteOnClose)
-        v = QVBoxLayout()
-        lbl = QLabel("A válasz folytatódik…")
-        lbl.setAlignment(Qt.AlignCenter)
-        lbl.setStyleSheet("font-size:16px; padding:20px;")
-        v.addWidget(lbl)
-        dlg.setLayout(v)
-        dlg.setFixedSize(300, 100)
-        QTimer.singleShot(3000, dlg.close)
-        QTimer.singleShot(3000, self.continue_request)
-        dlg.exec_()
+        if self._trunc_dialog is None:
+            dlg = QDialog(self)
+            dlg.setWindowTitle("Folytatás...")
+            dlg.setWindowFlags(Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint)
+            v = QVBoxLayout()
+            lbl = QLabel("A válasz folytatódik…")
+            lbl.setAlignment(Qt.AlignCenter)
+            lbl.setStyleSheet("font-size:16px; padding:20px;")
+            v.addWidget(lbl)
+            dlg.setLayout(v)
+            dlg.setFixedSize(300, 100)
+            self._trunc_dialog = dlg
+        self._trunc_dialog.show()
+        self.continue_timer.start()
 
     def clear_chat_display(self):
         """Chat törlése"""
+        self.cancel_continue()
         self.chat_display.clear()
         self.code_blocks = []
+        self._code_scan_pos = 0
+        self._code_scan_len = 0
+        self._code_hashes.clear()
+        self._fence_open = False
+        self._fence_ticks = 0
         while self.tab_widget.count() > 1:
             self.tab_widget.removeTab(1)
         self.code_tab_count = 0
@@ -921,48 +1459,58 @@ class MainWindow(QWidget):
                                             "", "JSON fájl (*.json);;Minden fájl (*)",
                                             options=QFileDialog.Options())
         if fn:
-            try:
-                with open(fn, 'w', encoding='utf-8') as f:
-                    json.dump(self.history, f, ensure_ascii=False, indent=2)
-                self.status_bar.showMessage(f"Chat mentve: {fn}")
-            except Exception as e:
-                QMessageBox.critical(self, "Mentési hiba", str(e))
+            self.run_file_task(write_json_file, (fn, list(self.history)),
+                               lambda _: self.status_bar.showMessage(f"Chat mentve: {fn}"),
+                               lambda e: QMessageBox.critical(self, "Mentési hiba", e))
 
     def load_chat(self):
         """Chat betöltése"""
         fn, _ = QFileDialog.getOpenFileName(self, "Chat betöltése",
-                                            "", "JSON fájl (*.json);;Minden fájl (*)",
+                                            "", "JSON fájl (*.json *.jsonl);;Minden fájl (*)",
                                             options=QFileDialog.Options())
         if fn:
-            try:
-                with open(fn, 'r', encoding='utf-8') as f:
-                    self.history = json.load(f)
-                self.clear_chat_display()
-                for m in self.history:
-                    role = m.get('role', 'user')
-                    content = m.get('content', '')
-                    self.append_to_chat(f"**{role.capitalize()}:** {content}\n\n", role=role)
-                self.process_code_blocks()
-                self.status_bar.showMessage(f"Chat betöltve: {fn}")
-            except Exception as e:
-                QMessageBox.critical(self, "Betöltési hiba", str(e))
+            self.run_file_task(
+                self.read_history, (fn,),
+                lambda history: self.show_loaded_history(
+                    history, None, f"Chat betöltve: {fn}", "Betöltési hiba"),
+                lambda e: QMessageBox.critical(self, "Betöltési hiba", e))
 
     def process_code_blocks(self):
-        """Kódblokkok feldolgozása"""
-        text = self.chat_display.toPlainText()
-        for m in re.finditer(r"^(```([a-zA-Z]{3,})\n(.*?)\n```)$",
-                             text, re.MULTILINE | re.DOTALL):
-            lang = m.group(2).strip() or "plaintext"
-            code = m.group(3).strip()
+        """Kódblokkok feldolgozása (csak az utolsó feldolgozott blokk utáni rész)"""
+        # A chat csak bővül: változatlan hossznál nincs új szöveg, amit át kellene nézni
+        doc_len = self.chat_display.document().characterCount()
+        if doc_len == self._code_scan_len:
+            return
+        self._code_scan_len = doc_len
+        text = self.chat_text_from(self._code_scan_pos)
+        # Teljes blokkhoz nyitó és záró kerítés is kell
+        if text.count('```') < 2:
+            return
+        end = 0
+        for m in CODE_BLOCK_RE.finditer(text):
+            lang = m.group(1).strip() or "plaintext"
+            code = m.group(2).strip()
             self.add_code_tab(lang, code)
+            end = m.end()
+        if end:
+            # A dokumentumpozíciók UTF-16 egységekben számolnak
+            self._code_scan_pos += len(text[:end].encode('utf-16-le')) // 2
+
+    def chat_text_from(self, pos):
+        """Chat szövege a megadott dokumentumpozíciótól a végéig"""
+        cursor = QTextCursor(self.chat_display.document())
+        cursor.setPosition(pos)
+        cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+        return cursor.selectedText().replace('\u2029', '\n')
 
     def add_code_tab(self, lang, code):
         """Új kódfül létrehozása"""
-        for i in range(1, self.tab_widget.count()):
-            w = self.tab_widget.widget(i)
-            if isinstance(w, CodeEditor) and w.text() == code:
-                return
+        code_hash = hash(code)
+        if code_hash in self._code_hashes:
+            return
+        self._code_hashes.add(code_hash)
         editor = CodeEditor()
+        editor.code_hash = code_hash
         editor.set_language(lang)
         editor.setText(code)
         self.code_tab_count += 1
@@ -982,87 +1530,65 @@ class MainWindow(QWidget):
         """Fül bezárása"""
         w = self.tab_widget.widget(idx)
         if w:
+            self._code_hashes.discard(getattr(w, 'code_hash', None))
             w.deleteLater()
         self.tab_widget.removeTab(idx)
         self.update_copy_button_state(self.tab_widget.currentIndex())
 
+    def schedule_search(self, _txt):
+        """Keresés késleltetése a gépelés szünetéig"""
+        self.search_timer.start()
+
+    def run_pending_search(self):
+        """Késleltetett keresés futtatása"""
+        self.search_chat(self.search_bar.text())
+
     def search_chat(self, txt):
-        """Chat keresése"""
-        if not txt:
-            self.reset_chat_formatting()
-            return
-        self.reset_chat_formatting()
-        cursor = self.chat_display.textCursor()
-        orig = cursor.position()
-        fmt = QTextCharFormat()
-        fmt.setBackground(QColor("yellow"))
-        self.chat_display.moveCursor(QTextCursor.Start)
-        while self.chat_display.find(txt):
-            self.chat_display.textCursor().mergeCharFormat(fmt)
-        self.chat_display.setTextCursor(cursor)
-        cursor.setPosition(orig)
-
-    def reset_chat_formatting(self):
-        """Chat formázás visszaállítása"""
-        cursor = self.chat_display.textCursor()
-        cursor.select(QTextCursor.Document)
-        fmt = QTextCharFormat()
-        fmt.setBackground(Qt.transparent)
-        cursor.mergeCharFormat(fmt)
-        cursor.clearSelection()
-        self.chat_display.setTextCursor(cursor)
+        """Chat keresése (kiemelés extraSelections-szel, a dokumentum módosítása nélkül)"""
+        selections = []
+        if txt:
+            if txt != self._search_term:
+                self._search_term = txt
+                self._search_re = QRegularExpression(QRegularExpression.escape(txt),
+                                                     QRegularExpression.CaseInsensitiveOption)
+            doc = self.chat_display.document()
+            cursor = doc.find(self._search_re)
+            while not cursor.isNull():
+                sel = QTextEdit.ExtraSelection()
+                sel.cursor = cursor
+                sel.format = self._search_fmt
+                selections.append(sel)
+                cursor = doc.find(self._search_re, cursor)
+        self.chat_display.setExtraSelections(selections)
 
     def set_generating_background(self, is_gen):
         """Állapotfüggő animált háttér beállítása"""
-        # Meglévő timer leállítása
-        if hasattr(self, 'bg_timer') and self.bg_timer.isActive():
-            self.bg_timer.stop()
-
-        # Kezdő és vég színek meghatározása
-        start_color = QColor(52, 73, 94)  # #34495e - alap szín
-        end_color = QColor(30,  30, 30)   # #54695e - generálás szín
-        
-        if is_gen:
-            self.bg_colors = [start_color, end_color]
-            
+        anim = self._bg_anim
+        # Futó animációnál az aktuális színből indulunk, hogy ne ugorjon a háttér
+        if anim.state() == QVariantAnimation.Running:
+            start_color = anim.currentValue()
+            anim.stop()
         else:
-            self.bg_colors = [end_color, start_color]  # Vissza az eredeti színre
-
-        self.current_step = 0
-        self.steps = 50  # Kevesebb lépés gyorsabb átmenet
-        self.bg_timer = QTimer()
-        self.bg_timer.timeout.connect(self._update_background_color)
-        self.bg_timer.start(20)  # 20 ms -> 50 FPS
-
-    def _update_background_color(self):
-        """Háttérszín frissítése az animációhoz"""
-        if self.current_step <= self.steps:
-            # Szín interpoláció
-            start_color = self.bg_colors[0]
-            end_color = self.bg_colors[1]
-            
-            ratio = self.current_step / self.steps
-            
-            r = int(start_color.red() + (end_color.red() - start_color.red()) * ratio)
-            g = int(start_color.green() + (end_color.green() - start_color.green()) * ratio)
-            b = int(start_color.blue() + (end_color.blue() - start_color.blue()) * ratio)
-            
-            color = QColor(r, g, b)
-            self.chat_display.setStyleSheet(f"background-color: {color.name()};")
-            
-            self.current_step += 1
-        else:
-            # Animáció vége - timer leállítása
-            self.bg_timer.stop()
-            # Biztosítjuk, hogy a végső szín beállítva legyen
-            final_color = self.bg_colors[1]
-            self.chat_display.setStyleSheet(f"background-color: {final_color.name()};")
+            start_color = self._bg_idle if is_gen else self._bg_generating
+        anim.setStartValue(start_color)
+        anim.setEndValue(self._bg_generating if is_gen else self._bg_idle)
+        anim.start()
+
+    def set_chat_background(self, color):
+        """Chat háttérszín beállítása (változatlan színnél nincs újraparszolás)"""
+        name = color.name()
+        if name == self._chat_bg_name:
+            return
+        self._chat_bg_name = name
+        self.chat_display.setStyleSheet(CHAT_BG_QSS.format(name))
   
 
-    def get_icon_path(self, name):
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def get_icon_path(name, config_dir):
         """Ikon elérési útja"""
         for p in [os.path.join(os.path.dirname(__file__), name),
-                  os.path.join(self.settings.config_dir, name),
+                  os.path.join(config_dir, name),
                   getattr(sys, "_MEIPASS", "")]:
             if os.path.exists(p):
                 return p
@@ -1070,18 +1596,22 @@ class MainWindow(QWidget):
 
     def get_icon(self, name):
         """Ikon betöltése"""
-        path = self.get_icon_path(name)
+        path = self.get_icon_path(name, self.settings.config_dir)
         return QIcon(path) if path else QIcon()
 
     def get_application_icon(self):
         """Alkalmazás ikonjának betöltése"""
-        return self.get_icon("icon.ico") or self.get_icon("icon.png") or QIcon()
+        if self._app_icon is None:
+            type(self)._app_icon = self.get_icon("icon.ico") or self.get_icon("icon.png") or QIcon()
+        return self._app_icon
 
     def stop_request(self):
         """Kérés leállítása"""
-        if self.worker and self.worker.isRunning():
+        self.cancel_continue()
+        if self.is_generating:
             self.worker.stop()
-            self.worker.wait()
+            self._assistant_parts.clear()
+            self.process_code_blocks()
             self.set_ui_state(True)
             self.is_generating = False
             self.set_generating_background(False)
@@ -1094,6 +1624,6 @@ if __name__ == "__main__":
     sys.exit(app.exec_())
 
     
-    #--hidden-import=cryptography --hidden-import=cryptography.fernet --hidden-import=psutil --hidden-import=aiohttp --hidden-import=asyncio --hidden-import=PyQt5.sip --hidden-import=PyQt5.QtCore --hidden-import=PyQt5.QtGui --hidden-import=PyQt5.QtWidgets --hidden-import=PyQt5.Qsci
+    #--hidden-import=cryptography --hidden-import=cryptography.fernet --hidden-import=orjson --hidden-import=PyQt5.QtNetwork --hidden-import=PyQt5.sip --hidden-import=PyQt5.QtCore --hidden-import=PyQt5.QtGui --hidden-import=PyQt5.QtWidgets --hidden-import=PyQt5.Qsci
 
  
\ No newline at end of file